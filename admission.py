@@ -0,0 +1,236 @@
+# goranify-backend/admission.py
+
+# کنترل پذیرش درخواست‌ها (admission control) و محدودیت نرخ، کاملاً در حافظه:
+# - محدودیت هم‌زمانی برای هر route با صف انتظار محدود و مهلت (503 + Retry-After)
+# - بودجه کوچک‌تر برای route های سنگین (جستجو و لیست‌هایی با limit بزرگ)
+# - سقف سراسری درخواست‌های در حال اجرا، به اندازه pool اتصال‌های دیتابیس
+# - token bucket برای هر کلاینت بر اساس X-API-Key معتبر یا IP (429 + Retry-After)
+
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+
+from starlette.datastructures import Headers, QueryParams
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+import database
+
+
+ROUTE_CONCURRENCY = int(os.getenv("ADMISSION_ROUTE_CONCURRENCY", "10"))
+ROUTE_QUEUE_SIZE = int(os.getenv("ADMISSION_ROUTE_QUEUE_SIZE", "20"))
+EXPENSIVE_CONCURRENCY = int(os.getenv("ADMISSION_EXPENSIVE_CONCURRENCY", "2"))
+EXPENSIVE_QUEUE_SIZE = int(os.getenv("ADMISSION_EXPENSIVE_QUEUE_SIZE", "5"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0")) # حداکثر زمان انتظار در صف (ثانیه)
+LARGE_LIMIT = int(os.getenv("ADMISSION_LARGE_LIMIT", "200")) # لیست‌هایی با limit بیشتر از این، سنگین حساب می‌شوند
+RATE_LIMIT_PER_SECOND = float(os.getenv("RATE_LIMIT_PER_SECOND", "10"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "40"))
+MAX_TRACKED_CLIENTS = 100000 # سقف تعداد bucket ها در حافظه
+# کلیدهای API معتبر (جداشده با کاما)؛ کلیدی که در این لیست نباشد نادیده گرفته می‌شود و IP ملاک است
+TRUSTED_API_KEYS = {k.strip() for k in os.getenv("API_KEYS", "").split(",") if k.strip()}
+
+
+def _default_global_concurrency() -> int:
+    # هر درخواست حداکثر یک Session دارد، پس سقف سراسری = ظرفیت کامل pool (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    if database.MAX_OVERFLOW < 0: # overflow نامحدود؛ سقف pool معنایی ندارد
+        return ROUTE_CONCURRENCY
+    return database.POOL_SIZE + database.MAX_OVERFLOW
+
+
+GLOBAL_CONCURRENCY = int(os.getenv("ADMISSION_GLOBAL_CONCURRENCY", "0")) or _default_global_concurrency()
+GLOBAL_QUEUE_SIZE = int(os.getenv("ADMISSION_GLOBAL_QUEUE_SIZE", "100"))
+
+# مسیرهایی که هیچ محدودیتی برایشان اعمال نمی‌شود
+EXEMPT_PATHS = {"/", "/health"}
+EXEMPT_PREFIXES = ("/metrics/", "/docs", "/redoc", "/openapi.json")
+# فایل‌های استاتیک به دیتابیس دسترسی ندارند؛ فقط محدودیت نرخ برایشان اعمال می‌شود
+UNBOUNDED_PREFIXES = ("/catalog/",)
+EXPENSIVE_PATHS = {"/musics/search/"}
+LIST_PATHS = {"/advertisements/", "/artists/", "/albums/", "/genres/", "/musics/", "/musics/search/"}
+# همه مسیرهایی که با هیچ route ای مطابقت ندارند یک bulkhead مشترک دارند
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    # محدودیت هم‌زمانی با صف FIFO محدود؛ درخواست‌هایی که در مهلت نوبتشان نرسد رد می‌شوند
+
+    def __init__(self, max_concurrent: int, max_queue: int, timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self._waiters = deque()
+
+    async def acquire(self, timeout: float = None):
+        # timeout: زمان باقی‌مانده تا مهلت درخواست (پیش‌فرض: مهلت کامل همین bulkhead)
+        timeout = self.timeout if timeout is None else timeout
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return
+        if len(self._waiters) >= self.max_queue or timeout <= 0:
+            raise AdmissionRejected(self.timeout)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise AdmissionRejected(self.timeout)
+        except asyncio.CancelledError: # قطع اتصال کلاینت در حین انتظار
+            self._abandon(waiter)
+            raise
+
+    def _abandon(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            # درست هم‌زمان با timeout نوبت رسیده بود؛ جایگاه را پس می‌دهیم
+            self.release()
+        else:
+            waiter.cancel()
+            self._waiters.remove(waiter)
+
+    def release(self):
+        # جایگاه مستقیماً به اولین منتظر منتقل می‌شود (active تغییر نمی‌کند)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        # اگر توکن باشد 0 برمی‌گرداند، وگرنه تعداد ثانیه تا توکن بعدی
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def _route_template(scope) -> str:
+    # قالب route (مثلاً /musics/{music_id}) از روی app.routes؛ تعداد کلیدها به تعداد route ها محدود است
+    app = scope.get("app")
+    for route in getattr(app, "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return f"{scope['method']} {route.path}"
+    return UNMATCHED_ROUTE
+
+
+def _is_expensive(path: str, query_string: bytes) -> bool:
+    # path همان مسیر درخواست است؛ LIST_PATHS و EXPENSIVE_PATHS پارامتر ندارند
+    if path in EXPENSIVE_PATHS:
+        return True
+    if path in LIST_PATHS:
+        try:
+            return int(QueryParams(query_string).get("limit", "0")) > LARGE_LIMIT
+        except ValueError:
+            return False
+    return False
+
+
+def _client_key(scope) -> str:
+    # فقط کلیدهای معتبر شناسه جدا می‌گیرند؛ وگرنه کلاینت با کلید تصادفی از محدودیت IP فرار می‌کند.
+    # پشت reverse proxy، scope["client"] باید با --proxy-headers در uvicorn آدرس واقعی کلاینت باشد.
+    api_key = Headers(scope=scope).get("x-api-key")
+    if api_key and api_key in TRUSTED_API_KEYS:
+        return f"key:{api_key}"
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def _reject(status_code: int, detail: str, retry_after: float):
+    return JSONResponse(
+        {"detail": detail},
+        status_code=status_code,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+class AdmissionControlMiddleware:
+    """
+    Middleware ASGI برای محدودیت نرخ هر کلاینت، محدودیت هم‌زمانی هر route و سقف سراسری.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.bulkheads = {}
+        self.buckets = OrderedDict()
+        self.global_bulkhead = Bulkhead(GLOBAL_CONCURRENCY, GLOBAL_QUEUE_SIZE, QUEUE_TIMEOUT)
+
+    def _bucket(self, key: str) -> TokenBucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+            self.buckets[key] = bucket
+            if len(self.buckets) > MAX_TRACKED_CLIENTS:
+                # کمترین استفاده اخیر حذف می‌شود؛ چون کلیدهای نامعتبر پذیرفته نمی‌شوند، پر کردن این سقف
+                # به همین تعداد IP واقعی نیاز دارد
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    def _bulkhead(self, route: str, expensive: bool) -> Bulkhead:
+        key = (route, expensive)
+        bulkhead = self.bulkheads.get(key)
+        if bulkhead is None:
+            if expensive:
+                bulkhead = Bulkhead(EXPENSIVE_CONCURRENCY, EXPENSIVE_QUEUE_SIZE, QUEUE_TIMEOUT)
+            else:
+                bulkhead = Bulkhead(ROUTE_CONCURRENCY, ROUTE_QUEUE_SIZE, QUEUE_TIMEOUT)
+            self.bulkheads[key] = bulkhead
+        return bulkhead
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or path in EXEMPT_PATHS or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        wait = self._bucket(_client_key(scope)).take()
+        if wait > 0:
+            await _reject(429, "Rate limit exceeded", wait)(scope, receive, send)
+            return
+
+        if path.startswith(UNBOUNDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        bulkhead = self._bulkhead(_route_template(scope), _is_expensive(path, scope.get("query_string", b"")))
+        deadline = time.monotonic() + QUEUE_TIMEOUT
+        try:
+            await bulkhead.acquire()
+        except AdmissionRejected as exc:
+            await _reject(503, "Server is busy, please retry later", exc.retry_after)(scope, receive, send)
+            return
+        try:
+            # سقف سراسری تا pool اتصال‌های دیتابیس (database.SessionLocal) تمام نشود
+            try:
+                await self.global_bulkhead.acquire(deadline - time.monotonic())
+            except AdmissionRejected as exc:
+                await _reject(503, "Server is busy, please retry later", exc.retry_after)(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                self.global_bulkhead.release()
+        finally:
+            bulkhead.release()
@@ -0,0 +1,236 @@
+# goranify-backend/compression.py
+
+# فشرده‌سازی پاسخ‌ها (gzip / brotli / zstd) بر اساس Accept-Encoding
+# پاسخ‌های پرتکرار فقط یک بار فشرده می‌شوند و نسخه فشرده آن‌ها بر اساس مسیر و ETag در حافظه نگه داشته می‌شود.
+
+import gzip
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+
+from etags import etag_matches
+
+# brotli و zstandard اختیاری هستند؛ اگر نصب نباشند فقط gzip استفاده می‌شود
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024")) # پاسخ‌های کوچک‌تر از این فشرده نمی‌شوند
+CACHE_MAX_BYTES = int(os.getenv("COMPRESSION_CACHE_BYTES", str(32 * 1024 * 1024)))
+COMPRESSIBLE_TYPES = ("application/json", "text/")
+
+
+def _compress_gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=6, mtime=0)
+
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=5)
+
+
+def _compress_zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=6).compress(data)
+
+
+# ترتیب ترجیح در صورت برابر بودن q در Accept-Encoding
+ENCODERS = OrderedDict()
+if zstandard is not None:
+    ENCODERS["zstd"] = _compress_zstd
+if brotli is not None:
+    ENCODERS["br"] = _compress_brotli
+ENCODERS["gzip"] = _compress_gzip
+
+
+def choose_encoding(accept_encoding: str):
+    # انتخاب بهترین encoding پشتیبانی‌شده بر اساس q-value های هدر Accept-Encoding
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for name in ENCODERS:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class CompressedCache:
+    # کش LRU با سقف حجم کل (بایت) برای بدنه‌های فشرده‌شده، با کلید ((path, query), ETag, encoding)
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+cache = CompressedCache(CACHE_MAX_BYTES)
+
+# آمار فشرده‌سازی برای /metrics/compression
+_stats_lock = threading.Lock()
+stats = {
+    name: {"responses": 0, "cache_hits": 0, "compressions": 0, "bytes_in": 0, "bytes_out": 0, "compress_seconds": 0.0}
+    for name in ENCODERS
+}
+
+
+def _record(encoding: str, bytes_in: int, bytes_out: int, cache_hit: bool, seconds: float = 0.0):
+    with _stats_lock:
+        s = stats[encoding]
+        s["responses"] += 1
+        s["bytes_in"] += bytes_in
+        s["bytes_out"] += bytes_out
+        if cache_hit:
+            s["cache_hits"] += 1
+        else:
+            s["compressions"] += 1
+            s["compress_seconds"] += seconds
+
+
+def get_metrics():
+    with _stats_lock:
+        result = {}
+        for name, s in stats.items():
+            item = dict(s)
+            item["ratio"] = round(s["bytes_out"] / s["bytes_in"], 4) if s["bytes_in"] else None
+            item["avg_compress_ms"] = round(s["compress_seconds"] * 1000 / s["compressions"], 3) if s["compressions"] else None
+            result[name] = item
+    result["cache"] = {"entries": len(cache), "bytes": cache.size, "max_bytes": cache.max_bytes}
+    return result
+
+
+def _compress_timed(encoding: str, body: bytes):
+    start = time.perf_counter()
+    compressed = ENCODERS[encoding](body)
+    return compressed, time.perf_counter() - start
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI برای فشرده‌سازی پاسخ‌های JSON/متنی.
+    اگر پاسخ ETag نداشته باشد، یک ETag ضعیف از روی محتوای بدنه ساخته می‌شود
+    و درخواستی که همان ETag را در If-None-Match بفرستد پاسخ 304 بدون بدنه می‌گیرد.
+    """
+
+    def __init__(self, app, minimum_size: int = MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if_none_match = request_headers.get("if-none-match")
+        # ETag فقط نسخه‌ای از یک resource را مشخص می‌کند؛ دو route می‌توانند ETag یکسان بفرستند
+        resource = (scope.get("path", ""), scope.get("query_string", b""))
+        start_message = None
+        passthrough = False
+        body_parts = []
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                # فایل‌ها و پاسخ‌های غیرمتنی بدون بافر کردن، مستقیم ارسال می‌شوند
+                if (
+                    message["status"] != 200
+                    or "content-encoding" in headers
+                    or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            await self._send_response(send, start_message, b"".join(body_parts), encoding, if_none_match, resource)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_response(self, send, start_message, body: bytes, encoding, if_none_match=None, resource=None):
+        headers = MutableHeaders(raw=start_message["headers"])
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag is None:
+            etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+            headers["ETag"] = etag
+
+        if if_none_match and etag_matches(if_none_match, etag):
+            # کلاینت همین نسخه را دارد؛ نه بدنه ارسال می‌شود و نه فشرده‌سازی انجام می‌شود
+            del headers["Content-Length"]
+            del headers["Content-Type"]
+            await send({**start_message, "status": 304, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if encoding is not None and len(body) >= self.minimum_size:
+            key = (resource, etag, encoding)
+            compressed = cache.get(key)
+            cache_hit, seconds = compressed is not None, 0.0
+            if not cache_hit:
+                compressed, seconds = await run_in_threadpool(_compress_timed, encoding, body)
+                cache.put(key, compressed)
+            # فقط وقتی نسخه فشرده واقعاً ارسال شود آمار ثبت می‌شود تا ratio همان بایت‌های ارسالی باشد
+            if len(compressed) < len(body):
+                _record(encoding, len(body), len(compressed), cache_hit=cache_hit, seconds=seconds)
+                body = compressed
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+
+        await send(start_message)
+        await send({"type": "http.response.body", "body": body})
@@ -1,10 +1,31 @@
 # goranify-backend/crud.py
 
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import or_ # برای جستجو
+from sqlalchemy import or_, func, select # برای جستجو و شمارش
 import models, schemas # ایمپورت کردن ماژول‌ها به صورت absolute
 
 
+# --- شمارنده‌های denormalized (track_count / album_count) ---
+def _bump_counter(db: Session, model, obj_id, column, delta: int):
+    # افزایش/کاهش اتمیک شمارنده در همان تراکنش (UPDATE ... SET col = col + delta)
+    # commit بعدی همه اشیاء را expire می‌کند، پس مقدار جدید در پاسخ دیده می‌شود
+    if obj_id is None or delta == 0:
+        return
+    db.query(model).filter(model.id == obj_id).update(
+        {column: column + delta}, synchronize_session=False
+    )
+
+def _bump_music_counters(db: Session, artist_id, album_id, genre_id, delta: int):
+    _bump_counter(db, models.Artist, artist_id, models.Artist.track_count, delta)
+    _bump_counter(db, models.Album, album_id, models.Album.track_count, delta)
+    _bump_counter(db, models.Genre, genre_id, models.Genre.track_count, delta)
+
+def _get_for_update(db: Session, model, obj_id: int):
+    # سطر با SELECT ... FOR UPDATE قفل می‌شود تا دو درخواست هم‌زمان که یک رکورد را جابه‌جا/حذف می‌کنند
+    # هر دو همان والد قدیمی را کم نکنند (درخواست دوم تا commit اولی منتظر می‌ماند و مقدار جدید را می‌بیند)
+    return db.query(model).filter(model.id == obj_id).with_for_update().populate_existing().first()
+
+
 # --- توابع CRUD برای Advertisement ---
 def create_advertisement(db: Session, advertisement: schemas.AdvertisementCreate):
     db_advertisement = models.Advertisement(**advertisement.model_dump())
@@ -16,14 +37,22 @@ def create_advertisement(db: Session, advertisement: schemas.AdvertisementCreate
 def get_advertisement(db: Session, advertisement_id: int):
     return db.query(models.Advertisement).filter(models.Advertisement.id == advertisement_id).first()
 
-def get_advertisements(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Advertisement).offset(skip).limit(limit).all()
+def get_advertisements(db: Session, skip: int = 0, limit: int = 100, exclude_broken: bool = False):
+    query = db.query(models.Advertisement)
+    if exclude_broken:
+        # تبلیغی که link آن مرده است نمایش داده نمی‌شود (link_checker.py)
+        query = query.filter(models.Advertisement.link_status != "broken")
+    return query.offset(skip).limit(limit).all()
 
 def update_advertisement(db: Session, advertisement_id: int, advertisement: schemas.AdvertisementCreate):
     db_advertisement = get_advertisement(db, advertisement_id)
     if db_advertisement:
+        old_urls = (db_advertisement.link, db_advertisement.cover_url)
         for key, value in advertisement.model_dump(exclude_unset=True).items():
             setattr(db_advertisement, key, value)
+        if (db_advertisement.link, db_advertisement.cover_url) != old_urls:
+            db_advertisement.link_status = "unknown"
+            db_advertisement.link_checked_at = None
         db.commit()
         db.refresh(db_advertisement)
         return db_advertisement
@@ -79,6 +108,7 @@ def delete_artist(db: Session, artist_id: int):
 def create_album(db: Session, album: schemas.AlbumCreate):
     db_album = models.Album(**album.model_dump())
     db.add(db_album)
+    _bump_counter(db, models.Artist, db_album.artist_id, models.Artist.album_count, 1)
     db.commit()
     db.refresh(db_album)
     return db_album
@@ -94,18 +124,27 @@ def get_albums(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Album).offset(skip).limit(limit).all()
 
 def update_album(db: Session, album_id: int, album: schemas.AlbumCreate):
-    db_album = get_album(db, album_id)
+    db_album = _get_for_update(db, models.Album, album_id)
     if db_album:
+        old_artist_id, old_cover_url = db_album.artist_id, db_album.cover_url
         for key, value in album.model_dump(exclude_unset=True).items():
             setattr(db_album, key, value)
+        if db_album.cover_url != old_cover_url:
+            db_album.link_status = "unknown"
+            db_album.link_checked_at = None
+        if db_album.artist_id != old_artist_id:
+            # آلبوم به خواننده دیگری منتقل شده است
+            _bump_counter(db, models.Artist, old_artist_id, models.Artist.album_count, -1)
+            _bump_counter(db, models.Artist, db_album.artist_id, models.Artist.album_count, 1)
         db.commit()
         db.refresh(db_album)
         return db_album
     return None
 
 def delete_album(db: Session, album_id: int):
-    db_album = get_album(db, album_id)
+    db_album = _get_for_update(db, models.Album, album_id)
     if db_album:
+        _bump_counter(db, models.Artist, db_album.artist_id, models.Artist.album_count, -1)
         db.delete(db_album)
         db.commit()
         return {"message": "Album deleted successfully"}
@@ -152,6 +191,7 @@ def delete_genre(db: Session, genre_id: int):
 def create_music(db: Session, music: schemas.MusicCreate):
     db_music = models.Music(**music.model_dump())
     db.add(db_music)
+    _bump_music_counters(db, db_music.artist_id, db_music.album_id, db_music.genre_id, 1)
     db.commit()
     db.refresh(db_music)
     return db_music
@@ -164,13 +204,20 @@ def get_music(db: Session, music_id: int):
         joinedload(models.Music.genre)
     ).filter(models.Music.id == music_id).first()
 
-def get_musics(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Music).offset(skip).limit(limit).all()
+def get_musics(db: Session, skip: int = 0, limit: int = 100, exclude_broken: bool = False):
+    query = db.query(models.Music)
+    if exclude_broken:
+        # ستون link_status ایندکس دارد و توسط link_checker.py پر می‌شود
+        query = query.filter(models.Music.link_status != "broken")
+    return query.offset(skip).limit(limit).all()
 
-def search_musics(db: Session, query: str, skip: int = 0, limit: int = 100):
+def search_musics(db: Session, query: str, skip: int = 0, limit: int = 100, exclude_broken: bool = False):
     search_pattern = f"%{query.lower()}%"
+    db_query = db.query(models.Music)
+    if exclude_broken:
+        db_query = db_query.filter(models.Music.link_status != "broken")
     return (
-        db.query(models.Music)
+        db_query
         .filter(
             or_(
                 models.Music.title.ilike(search_pattern),
@@ -186,19 +233,54 @@ def search_musics(db: Session, query: str, skip: int = 0, limit: int = 100):
 
 
 def update_music(db: Session, music_id: int, music: schemas.MusicCreate):
-    db_music = get_music(db, music_id)
+    db_music = _get_for_update(db, models.Music, music_id)
     if db_music:
+        old_artist_id, old_album_id, old_genre_id = db_music.artist_id, db_music.album_id, db_music.genre_id
+        old_urls = (db_music.audio_128_url, db_music.audio_320_url, db_music.cover_url)
         for key, value in music.model_dump(exclude_unset=True).items():
             setattr(db_music, key, value)
+        if (db_music.audio_128_url, db_music.audio_320_url, db_music.cover_url) != old_urls:
+            # لینک‌ها عوض شده‌اند؛ وضعیت قبلی دیگر معتبر نیست
+            db_music.link_status = "unknown"
+            db_music.link_checked_at = None
+        # اگر آهنگ بین خواننده/آلبوم/ژانر جابه‌جا شده، شمارنده‌های هر دو طرف اصلاح می‌شوند
+        if db_music.artist_id != old_artist_id:
+            _bump_counter(db, models.Artist, old_artist_id, models.Artist.track_count, -1)
+            _bump_counter(db, models.Artist, db_music.artist_id, models.Artist.track_count, 1)
+        if db_music.album_id != old_album_id:
+            _bump_counter(db, models.Album, old_album_id, models.Album.track_count, -1)
+            _bump_counter(db, models.Album, db_music.album_id, models.Album.track_count, 1)
+        if db_music.genre_id != old_genre_id:
+            _bump_counter(db, models.Genre, old_genre_id, models.Genre.track_count, -1)
+            _bump_counter(db, models.Genre, db_music.genre_id, models.Genre.track_count, 1)
         db.commit()
         db.refresh(db_music)
         return db_music
     return None
 
 def delete_music(db: Session, music_id: int):
-    db_music = get_music(db, music_id)
+    db_music = _get_for_update(db, models.Music, music_id)
     if db_music:
+        _bump_music_counters(db, db_music.artist_id, db_music.album_id, db_music.genre_id, -1)
         db.delete(db_music)
         db.commit()
         return {"message": "Music deleted successfully"}
-    return None
\ No newline at end of file
+    return None
+
+
+# --- بازسازی شمارنده‌ها ---
+def reconcile_counters(db: Session):
+    # همه شمارنده‌ها را از روی داده واقعی دوباره محاسبه می‌کند (برای ترمیم پس از drift یا مهاجرت)
+    artist_tracks = select(func.count(models.Music.id)).where(models.Music.artist_id == models.Artist.id).scalar_subquery()
+    artist_albums = select(func.count(models.Album.id)).where(models.Album.artist_id == models.Artist.id).scalar_subquery()
+    album_tracks = select(func.count(models.Music.id)).where(models.Music.album_id == models.Album.id).scalar_subquery()
+    genre_tracks = select(func.count(models.Music.id)).where(models.Music.genre_id == models.Genre.id).scalar_subquery()
+
+    db.query(models.Artist).update(
+        {models.Artist.track_count: artist_tracks, models.Artist.album_count: artist_albums},
+        synchronize_session=False
+    )
+    db.query(models.Album).update({models.Album.track_count: album_tracks}, synchronize_session=False)
+    db.query(models.Genre).update({models.Genre.track_count: genre_tracks}, synchronize_session=False)
+    db.commit()
+    return {"message": "Counters reconciled successfully"}
@@ -12,8 +12,12 @@ load_dotenv()
 # اطلاعات اتصال به دیتابیس از متغیر محیطی DATABASE_URL
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# اندازه pool اتصال‌ها (پیش‌فرض‌های خود SQLAlchemy)؛ admission.py سقف سراسری را از همین مقادیر می‌گیرد
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+
 # ساخت Engine: مسئول ارتباط با دیتابیس
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
 
 # ساخت SessionLocal: هر SessionLocal یک Session برای تعامل با دیتابیس است
 # autocommit=False: یعنی تغییرات به صورت خودکار ذخیره نمی‌شوند، باید commit کنیم
@@ -0,0 +1,18 @@
+# goranify-backend/etags.py
+
+# توابع مشترک ETag برای endpoint snapshot و middleware فشرده‌سازی
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # مقایسه ضعیف ETag ها طبق RFC 9110 (لیست جداشده با کاما، پیشوند W/ و مقدار *)
+    if etag.startswith("W/"):
+        etag = etag[2:]
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,231 @@
+# goranify-backend/link_checker.py
+
+# بررسی سلامت لینک‌های خارجی (audio_128_url, audio_320_url، link تبلیغ و cover_url ها) به صورت asyncio
+# - تعداد درخواست‌های هم‌زمان محدود است و یک AsyncClient (با keep-alive) برای همه استفاده می‌شود
+# - برای هر host محدودیت هم‌زمانی و فاصله زمانی بین درخواست‌ها اعمال می‌شود
+# - ابتدا HEAD زده می‌شود؛ اگر سرور HEAD را پشتیبانی نکند، GET با Range: bytes=0-0
+# نتیجه در ستون‌های link_status / link_checked_at ذخیره می‌شود.
+# اجرا به صورت جداگانه: python link_checker.py
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import httpx
+
+import models
+import database
+
+CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "20"))
+PER_HOST_CONCURRENCY = int(os.getenv("LINK_CHECK_PER_HOST_CONCURRENCY", "4"))
+PER_HOST_RATE = float(os.getenv("LINK_CHECK_PER_HOST_RATE", "10")) # حداکثر درخواست در ثانیه برای هر host
+TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", "10"))
+CHECK_INTERVAL = int(os.getenv("LINK_CHECK_INTERVAL", "86400")) # فاصله بین دو دور بررسی (ثانیه)
+BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+# وضعیت هر URL
+URL_OK = "ok"
+URL_DEAD = "dead" # 404/410 یا خطای 4xx قطعی
+URL_ERROR = "error" # خطای شبکه، timeout یا 5xx (ممکن است موقتی باشد)
+
+# وضعیت هر رکورد (Music / Album / Advertisement)؛ "broken" در لیست‌ها قابل حذف است
+STATUS_UNKNOWN = "unknown"
+STATUS_OK = "ok"
+STATUS_BROKEN = "broken" # یکی از لینک‌های اصلی (صوتی، یا link تبلیغ) مرده است
+STATUS_ERROR = "error" # بررسی با خطای موقتی مواجه شد
+STATUS_COVER_BROKEN = "cover_broken" # فقط کاور مرده است
+
+# کدهایی که یعنی سرور HEAD را درست پشتیبانی نمی‌کند و باید با GET دوباره امتحان کرد
+_HEAD_FALLBACK_CODES = {400, 403, 405, 501}
+
+
+class HostLimiter:
+    # محدودیت هم‌زمانی و نرخ درخواست برای یک host
+
+    def __init__(self, concurrency: int, rate: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = asyncio.Lock()
+        self._next_at = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            async with self._lock:
+                now = time.monotonic()
+                delay = self._next_at - now
+                self._next_at = max(now, self._next_at) + self.interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+        except BaseException: # لغو task در حین انتظار؛ جایگاه host نباید از دست برود
+            self.semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc):
+        self.semaphore.release()
+
+
+class LinkChecker:
+    """
+    بررسی‌کننده هم‌زمان URL ها. client قابل تزریق است تا بتوان آن را
+    در برابر یک سرور HTTP محلی اجرا کرد.
+    """
+
+    def __init__(self, client: httpx.AsyncClient, concurrency: int = CONCURRENCY,
+                 per_host_concurrency: int = PER_HOST_CONCURRENCY, per_host_rate: float = PER_HOST_RATE):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_rate = per_host_rate
+        self._hosts = {}
+
+    def _host_limiter(self, url: str) -> HostLimiter:
+        host = urlsplit(url).netloc.lower()
+        limiter = self._hosts.get(host)
+        if limiter is None:
+            limiter = HostLimiter(self.per_host_concurrency, self.per_host_rate)
+            self._hosts[host] = limiter
+        return limiter
+
+    async def _request(self, url: str) -> int:
+        response = await self.client.head(url)
+        if response.status_code in _HEAD_FALLBACK_CODES:
+            # فقط بایت اول دریافت می‌شود؛ بدنه کامل فایل صوتی دانلود نمی‌شود
+            async with self.client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+                return response.status_code
+        return response.status_code
+
+    async def check_url(self, url: str) -> str:
+        # اول semaphore سراسری و بعد محدودیت host: نوبت نرخ host فقط وقتی گرفته می‌شود که درخواست
+        # واقعاً می‌تواند ارسال شود، وگرنه درخواست‌هایی که نوبتشان گذشته هم‌زمان ارسال می‌شدند
+        async with self.semaphore:
+            try:
+                async with self._host_limiter(url):
+                    status_code = await self._request(url)
+            except (httpx.InvalidURL, ValueError):
+                # URL خراب ذخیره‌شده (مثلاً پورت نامعتبر یا IPv6 ناقص) هرگز قابل دسترسی نیست
+                return URL_DEAD
+            except httpx.HTTPError:
+                return URL_ERROR
+        if status_code < 400:
+            return URL_OK
+        if status_code >= 500 or status_code == 429:
+            return URL_ERROR
+        return URL_DEAD
+
+    async def check_urls(self, urls) -> dict:
+        # هر URL فقط یک بار بررسی می‌شود، حتی اگر در چند رکورد تکرار شده باشد
+        unique = list(dict.fromkeys(u for u in urls if u))
+        results = await asyncio.gather(*(self.check_url(u) for u in unique))
+        return dict(zip(unique, results))
+
+
+def new_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=TIMEOUT,
+        follow_redirects=True,
+        limits=httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY),
+    )
+
+
+def _record_status(audio_urls, cover_url, results: dict) -> str:
+    audio = [results[u] for u in audio_urls if u]
+    if URL_DEAD in audio:
+        return STATUS_BROKEN
+    if URL_ERROR in audio:
+        return STATUS_ERROR
+    cover = results.get(cover_url) if cover_url else URL_OK
+    if cover == URL_DEAD:
+        return STATUS_COVER_BROKEN
+    if cover == URL_ERROR:
+        return STATUS_ERROR
+    return STATUS_OK
+
+
+def _load_batch(model, columns, last_id: int):
+    db = database.SessionLocal()
+    try:
+        return (
+            db.query(model.id, *[getattr(model, c) for c in columns])
+            .filter(model.id > last_id)
+            .order_by(model.id)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+    finally:
+        db.close()
+
+
+def _save_statuses(model, columns, updates, checked_at):
+    # UPDATE فقط وقتی اعمال می‌شود که URL ها هنوز همان‌هایی باشند که بررسی شدند؛
+    # اگر ادمین در این فاصله لینک را عوض کرده باشد، وضعیت "unknown" که crud گذاشته حفظ می‌شود
+    db = database.SessionLocal()
+    try:
+        for row, status in updates:
+            query = db.query(model).filter(model.id == row[0])
+            for name, value in zip(columns, row[1:]):
+                column = getattr(model, name)
+                query = query.filter(column.is_(None) if value is None else column == value)
+            query.update(
+                {model.link_status: status, model.link_checked_at: checked_at},
+                synchronize_session=False
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _check_table(checker: LinkChecker, model, audio_columns, cover_column):
+    # رکوردها دسته‌ای خوانده، بررسی و ذخیره می‌شوند تا کل جدول در حافظه نماند
+    columns = list(audio_columns) + [cover_column]
+    last_id = 0
+    while True:
+        rows = await asyncio.to_thread(_load_batch, model, columns, last_id)
+        if not rows:
+            return
+        results = await checker.check_urls(url for row in rows for url in row[1:])
+        checked_at = datetime.now(timezone.utc).replace(tzinfo=None)
+        updates = [(row, _record_status(row[1:-1], row[-1], results)) for row in rows]
+        await asyncio.to_thread(_save_statuses, model, columns, updates, checked_at)
+        last_id = rows[-1][0]
+
+
+async def check_all_links(client: httpx.AsyncClient = None):
+    # یک دور کامل بررسی لینک‌های آهنگ‌ها، کاور آلبوم‌ها و لینک/کاور تبلیغات
+    own_client = client is None
+    if own_client:
+        client = new_client()
+    try:
+        checker = LinkChecker(client)
+        await _check_table(checker, models.Music, ("audio_128_url", "audio_320_url"), "cover_url")
+        await _check_table(checker, models.Album, (), "cover_url")
+        await _check_table(checker, models.Advertisement, ("link",), "cover_url")
+    finally:
+        if own_client:
+            await client.aclose()
+
+
+async def run_forever():
+    while True:
+        try:
+            await check_all_links()
+        except Exception: # خطای یک دور نباید حلقه را متوقف کند
+            logger.exception("Link check failed")
+        await asyncio.sleep(CHECK_INTERVAL)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if "--once" in sys.argv:
+        asyncio.run(check_all_links())
+    else:
+        asyncio.run(run_forever())
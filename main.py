@@ -2,17 +2,23 @@
 
 import os
 import sys
+from contextlib import asynccontextmanager
 
 # این خط کمک می‌کنه پایتون ماژول‌های داخلی پروژه رو پیدا کنه
 sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
 
 
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from typing import List # برای استفاده از List در Response Model ها
 # ایمپورت کردن ماژول‌ها به صورت absolute (بدون نقطه اول)
 import models, schemas, crud
 import database
+import snapshot
+import etags
+import compression
+import admission
 from fastapi.middleware.cors import CORSMiddleware
 
 # ایجاد جداول در دیتابیس
@@ -20,10 +26,22 @@ from fastapi.middleware.cors import CORSMiddleware
 # این عملیات فقط یک بار در زمان راه‌اندازی برنامه (اگر جداول موجود نباشند) انجام می‌شود.
 database.Base.metadata.create_all(bind=database.engine)
 
+
+# شروع و توقف سازنده snapshot کاتالوگ در پس‌زمینه
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    snapshot.start_builder()
+    try:
+        yield
+    finally:
+        snapshot.stop_builder()
+
+
 app = FastAPI(
     title="Goranify Music Downloader API",
     description="API for managing and downloading Kurdish music and related data.",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # تنظیمات CORS: این بخش برای ارتباط بین بک‌اند و فرانت‌اند لازمه
@@ -33,6 +51,13 @@ origins = [
     # هر آدرس دیگری که پنل فرانت‌اندت بعداً روش دیپلوی میشه، اینجا اضافه کن
 ]
 
+# فشرده‌سازی پاسخ‌های JSON (gzip/br/zstd) با کش نسخه‌های فشرده بر اساس ETag
+app.add_middleware(compression.CompressionMiddleware, minimum_size=compression.MINIMUM_SIZE)
+
+# کنترل پذیرش و محدودیت نرخ
+app.add_middleware(admission.AdmissionControlMiddleware)
+
+# CORS آخر اضافه می‌شود تا بیرونی‌ترین لایه باشد و پاسخ‌های 429/503 هم هدرهای CORS داشته باشند
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -59,6 +84,14 @@ async def read_root():
     return {"message": "Welcome to Goranify Backend! Explore /docs for API endpoints."}
 
 
+@app.get("/metrics/compression")
+async def compression_metrics():
+    """
+    آمار فشرده‌سازی پاسخ‌ها (تعداد، نسبت فشرده‌سازی، زمان و وضعیت کش) را برمی‌گرداند.
+    """
+    return compression.get_metrics()
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -77,11 +110,12 @@ def create_advertisement(advertisement: schemas.AdvertisementCreate, db: Session
 
 
 @app.get("/advertisements/", response_model=List[schemas.Advertisement])
-def read_advertisements(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_advertisements(skip: int = 0, limit: int = 100, exclude_broken: bool = False, db: Session = Depends(get_db)):
     """
     لیستی از تبلیغات را دریافت می‌کند.
+    با exclude_broken=true تبلیغاتی که link مرده دارند حذف می‌شوند.
     """
-    return crud.get_advertisements(db, skip=skip, limit=limit)
+    return crud.get_advertisements(db, skip=skip, limit=limit, exclude_broken=exclude_broken)
 
 
 @app.get("/advertisements/{advertisement_id}", response_model=schemas.Advertisement)
@@ -277,19 +311,21 @@ def create_music(music: schemas.MusicCreate, db: Session = Depends(get_db)):
 
 
 @app.get("/musics/", response_model=List[schemas.Music])
-def read_musics(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_musics(skip: int = 0, limit: int = 100, exclude_broken: bool = False, db: Session = Depends(get_db)):
     """
     لیستی از آهنگ‌ها را دریافت می‌کند.
+    با exclude_broken=true آهنگ‌هایی که لینک صوتی مرده دارند حذف می‌شوند.
     """
-    return crud.get_musics(db, skip=skip, limit=limit)
+    return crud.get_musics(db, skip=skip, limit=limit, exclude_broken=exclude_broken)
 
 
 @app.get("/musics/search/", response_model=List[schemas.Music])
-def search_musics(query: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def search_musics(query: str, skip: int = 0, limit: int = 100, exclude_broken: bool = False, db: Session = Depends(get_db)):
     """
     آهنگ‌ها را بر اساس عنوان، خواننده یا آلبوم جستجو می‌کند.
+    با exclude_broken=true آهنگ‌هایی که لینک صوتی مرده دارند حذف می‌شوند.
     """
-    return crud.search_musics(db, query, skip=skip, limit=limit)
+    return crud.search_musics(db, query, skip=skip, limit=limit, exclude_broken=exclude_broken)
 
 
 @app.get("/musics/{music_id}", response_model=schemas.Music)
@@ -322,4 +358,43 @@ def delete_music(music_id: int, db: Session = Depends(get_db)):
     db_music = crud.delete_music(db, music_id)
     if db_music is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Music not found")
-    return None
\ No newline at end of file
+    return None
+
+
+# --- Catalog Snapshot Endpoints ---
+@app.get("/catalog/snapshot/manifest")
+def read_catalog_snapshot_manifest():
+    """
+    اطلاعات آخرین snapshot کاتالوگ (نسخه، اندازه و sha256) را برمی‌گرداند.
+    """
+    manifest = snapshot.get_manifest()
+    if manifest is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Catalog snapshot not ready", headers={"Retry-After": "60"})
+    return manifest
+
+
+# HEAD هم پذیرفته می‌شود تا دانلودکننده‌ها قبل از دانلود اندازه، ETag و Accept-Ranges را بگیرند
+@app.api_route("/catalog/snapshot", methods=["GET", "HEAD"])
+def read_catalog_snapshot(request: Request):
+    """
+    آخرین snapshot فشرده کاتالوگ (SQLite + gzip) را به صورت فایل استاتیک برمی‌گرداند.
+    از ETag/If-None-Match و Range برای ادامه دانلود پشتیبانی می‌کند.
+    """
+    manifest = snapshot.get_manifest()
+    if manifest is None:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Catalog snapshot not ready", headers={"Retry-After": "60"})
+    etag = f'"{manifest["sha256"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=300",
+        "X-Catalog-Version": str(manifest["version"]),
+    }
+    if etags.etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    # FileResponse درخواست‌های Range (و If-Range با همین ETag) را خودش پاسخ می‌دهد
+    return FileResponse(
+        os.path.join(snapshot.SNAPSHOT_DIR, manifest["file"]),
+        media_type="application/gzip",
+        filename=manifest["file"],
+        headers=headers,
+    )
@@ -14,6 +14,8 @@ class Advertisement(database.Base):
     link = Column(String, nullable=False)
     cover_url = Column(String, nullable=True) # URL تصویر یا کاور تبلیغ
     sponsor = Column(String, nullable=True)
+    link_status = Column(String, nullable=False, default="unknown", server_default="unknown", index=True) # وضعیت link و کاور (link_checker.py)
+    link_checked_at = Column(DateTime, nullable=True) # زمان آخرین بررسی لینک‌ها
 
 
 class Artist(database.Base):
@@ -25,6 +27,9 @@ class Artist(database.Base):
     is_alive = Column(Boolean, default=True)
     death_date = Column(DateTime, nullable=True) # فقط در صورت is_alive = False
     biography = Column(Text, nullable=True)
+    # شمارنده‌های denormalized: توسط crud به‌روز می‌شوند و با reconcile_counters.py قابل ترمیم هستند
+    album_count = Column(Integer, nullable=False, default=0, server_default="0")
+    track_count = Column(Integer, nullable=False, default=0, server_default="0")
 
     # روابط با جداول دیگر
     albums = relationship("Album", back_populates="artist")
@@ -39,6 +44,9 @@ class Album(database.Base):
     cover_url = Column(String, nullable=True) # URL کاور آلبوم
     release_year = Column(Integer, nullable=True)
     artist_id = Column(Integer, ForeignKey("artists.id"), nullable=False) # ارتباط با جدول Artist
+    track_count = Column(Integer, nullable=False, default=0, server_default="0") # تعداد آهنگ‌های آلبوم (denormalized)
+    link_status = Column(String, nullable=False, default="unknown", server_default="unknown", index=True) # وضعیت لینک کاور (link_checker.py)
+    link_checked_at = Column(DateTime, nullable=True) # زمان آخرین بررسی لینک
 
     # روابط با جداول دیگر
     artist = relationship("Artist", back_populates="albums")
@@ -50,6 +58,7 @@ class Genre(database.Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False, unique=True, index=True) # نام ژانر باید یکتا باشد
+    track_count = Column(Integer, nullable=False, default=0, server_default="0") # تعداد آهنگ‌های ژانر (denormalized)
 
     # رابطه با جدول Music
     musics = relationship("Music", back_populates="genre")
@@ -68,6 +77,8 @@ class Music(database.Base):
     audio_128_url = Column(String, nullable=False) # آدرس آهنگ با کیفیت 128
     audio_320_url = Column(String, nullable=False) # آدرس آهنگ با کیفیت 320
     # سال انتشار از جدول آلبوم گرفته می‌شود و نیازی به ذخیره مستقیم ندارد
+    link_status = Column(String, nullable=False, default="unknown", server_default="unknown", index=True) # وضعیت لینک‌های صوتی و کاور (link_checker.py)
+    link_checked_at = Column(DateTime, nullable=True) # زمان آخرین بررسی لینک‌ها
 
     # روابط با جداول دیگر
     album = relationship("Album", back_populates="musics")
@@ -0,0 +1,25 @@
+# goranify-backend/reconcile_counters.py
+
+# اسکریپت ترمیم شمارنده‌های denormalized (track_count / album_count)
+# اجرا: python reconcile_counters.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+import crud
+import database
+
+
+def main():
+    db = database.SessionLocal()
+    try:
+        result = crud.reconcile_counters(db)
+        print(result["message"])
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
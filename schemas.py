@@ -70,6 +70,9 @@ class MusicCreate(MusicBase):
 # وقتی یک مدل به مدل دیگری که هنوز تعریف نشده اشاره می‌کند.
 class Album(AlbumBase):
     id: int
+    track_count: int = 0 # تعداد آهنگ‌های آلبوم (شمارنده ذخیره‌شده)
+    link_status: str = "unknown" # وضعیت لینک کاور: unknown, ok, cover_broken, error
+    link_checked_at: Optional[datetime] = None
     # artist: 'Artist' # این مورد در نهایت در Artist schema تعریف می شود
     musics: List['Music'] = [] # لیست آهنگ‌های مرتبط با آلبوم
 
@@ -79,6 +82,8 @@ class Album(AlbumBase):
 # برای Artist
 class Artist(ArtistBase):
     id: int
+    album_count: int = 0 # تعداد آلبوم‌های خواننده (شمارنده ذخیره‌شده)
+    track_count: int = 0 # تعداد آهنگ‌های خواننده (شمارنده ذخیره‌شده)
     albums: List[Album] = [] # لیست آلبوم‌های مرتبط با خواننده
     musics: List['Music'] = [] # لیست آهنگ‌های مرتبط با خواننده (برای سهولت دسترسی)
 
@@ -88,6 +93,7 @@ class Artist(ArtistBase):
 # برای Genre
 class Genre(GenreBase):
     id: int
+    track_count: int = 0 # تعداد آهنگ‌های ژانر (شمارنده ذخیره‌شده)
     musics: List['Music'] = [] # لیست آهنگ‌های مرتبط با ژانر
 
     class Config:
@@ -96,6 +102,8 @@ class Genre(GenreBase):
 # برای Music
 class Music(MusicBase):
     id: int
+    link_status: str = "unknown" # وضعیت لینک‌ها: unknown, ok, broken, cover_broken, error
+    link_checked_at: Optional[datetime] = None
     # album: Optional[Album] # این مورد در نهایت در Album schema تعریف می شود
     artist: Artist # خواننده مرتبط (فیلد اصلی)
     genre: Optional[Genre] = None # ژانر مرتبط
@@ -113,6 +121,8 @@ Music.model_rebuild()
 
 class Advertisement(AdvertisementBase):
     id: int
+    link_status: str = "unknown" # وضعیت لینک‌ها: unknown, ok, broken, cover_broken, error
+    link_checked_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -0,0 +1,246 @@
+# goranify-backend/snapshot.py
+
+# ساخت snapshot فشرده از کاتالوگ (artists, albums, genres, musics بدون lyrics)
+# کلاینت‌هایی که تازه نصب شده‌اند به‌جای صفحه‌به‌صفحه خواندن همه endpoint ها،
+# یک فایل SQLite فشرده (gzip) را یک‌جا دانلود می‌کنند.
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+import models
+import database
+
+# fcntl فقط روی یونیکس وجود دارد؛ روی ویندوز قفل فایل با msvcrt گرفته می‌شود
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# محل ذخیره snapshot ها و فاصله زمانی ساخت دوباره (ثانیه)
+SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots"))
+SNAPSHOT_INTERVAL = int(os.getenv("CATALOG_SNAPSHOT_INTERVAL", "3600"))
+# با مقدار 0 سازنده داخل worker های API اجرا نمی‌شود (برای اجرا به صورت پروسه جدا: python snapshot.py)
+SNAPSHOT_IN_PROCESS = os.getenv("CATALOG_SNAPSHOT_IN_PROCESS", "1") != "0"
+SNAPSHOT_KEEP = 2 # تعداد نسخه‌های قدیمی که روی دیسک نگه داشته می‌شوند (برای دانلودهای نیمه‌کاره)
+SNAPSHOT_SCHEMA_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".build.lock"
+
+logger = logging.getLogger(__name__)
+
+# ستون‌هایی که در snapshot نوشته می‌شوند (lyrics عمداً حذف شده است)
+_TABLES = {
+    "artists": (models.Artist, ["id", "full_name", "birth_date", "is_alive", "death_date", "biography", "album_count", "track_count"]),
+    "albums": (models.Album, ["id", "title", "cover_url", "release_year", "artist_id", "track_count"]),
+    "genres": (models.Genre, ["id", "name", "track_count"]),
+    "musics": (models.Music, ["id", "title", "album_id", "artist_id", "cover_url", "genre_id", "audio_128_url", "audio_320_url", "link_status"]),
+}
+
+_stop_event = threading.Event()
+_thread = None
+
+
+def _to_sqlite_value(value):
+    # تاریخ‌ها به صورت رشته ISO ذخیره می‌شوند
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+def _write_sqlite(db, path: str):
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT INTO meta VALUES ('schema_version', ?)", (str(SNAPSHOT_SCHEMA_VERSION),))
+        for table, (model, columns) in _TABLES.items():
+            conn.execute(f"CREATE TABLE {table} ({', '.join(c + (' INTEGER PRIMARY KEY' if c == 'id' else '') for c in columns)})")
+            insert = f"INSERT INTO {table} VALUES ({', '.join('?' for _ in columns)})"
+            # فقط ستون‌های لازم کوئری می‌شوند (نه کل شیء ORM) و به صورت دسته‌ای خوانده می‌شوند
+            query = db.query(*[getattr(model, c) for c in columns]).order_by(model.id).yield_per(1000)
+            conn.executemany(insert, ([_to_sqlite_value(v) for v in row] for row in query))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_manifest():
+    # اطلاعات آخرین snapshot ساخته‌شده، یا None اگر هنوز ساخته نشده باشد
+    path = os.path.join(SNAPSHOT_DIR, MANIFEST_NAME)
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(os.path.join(SNAPSHOT_DIR, manifest["file"])):
+        return None
+    return manifest
+
+
+def _cleanup(current_file: str):
+    files = sorted(
+        (f for f in os.listdir(SNAPSHOT_DIR) if f.startswith("catalog-") and f.endswith(".sqlite.gz")),
+        key=lambda f: os.path.getmtime(os.path.join(SNAPSHOT_DIR, f)),
+        reverse=True,
+    )
+    for name in files[SNAPSHOT_KEEP:]:
+        if name != current_file:
+            os.remove(os.path.join(SNAPSHOT_DIR, name))
+
+
+def _manifest_age():
+    try:
+        return time.time() - os.path.getmtime(os.path.join(SNAPSHOT_DIR, MANIFEST_NAME))
+    except OSError:
+        return None
+
+
+def _try_lock(lock_file) -> bool:
+    # قفل انحصاری بدون انتظار روی فایل قفل؛ False یعنی پروسه دیگری قفل را دارد
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(lock_file):
+    if fcntl is not None:
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+    else:
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _write_manifest(manifest: dict):
+    # نوشتن اتمیک با فایل موقت یکتا: درخواست‌های هم‌زمان همیشه یک نسخه کامل را می‌بینند
+    fd, tmp_path = tempfile.mkstemp(dir=SNAPSHOT_DIR, prefix=MANIFEST_NAME, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(manifest, f)
+        # mkstemp فایل را با دسترسی 0600 می‌سازد؛ API ممکن است با کاربر دیگری اجرا شود (python snapshot.py)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(SNAPSHOT_DIR, MANIFEST_NAME))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def build_snapshot(force: bool = False):
+    """
+    یک snapshot جدید می‌سازد؛ اگر محتوا تغییری نکرده باشد همان نسخه قبلی باقی می‌ماند.
+    با چند worker فقط یک پروسه در هر لحظه می‌سازد (قفل فایل) و اگر snapshot تازه‌تر از
+    SNAPSHOT_INTERVAL باشد (مثلاً توسط worker دیگری ساخته شده) ساخت دوباره انجام نمی‌شود.
+    خروجی None یعنی ساخت انجام نشد.
+    """
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, LOCK_NAME), "w") as lock_file:
+        if not _try_lock(lock_file):
+            return None # پروسه دیگری در حال ساخت است
+        try:
+            age = _manifest_age()
+            if not force and age is not None and age < SNAPSHOT_INTERVAL and get_manifest() is not None:
+                return None
+            return _build_locked()
+        finally:
+            _unlock(lock_file)
+
+
+def _build_locked():
+    with tempfile.TemporaryDirectory(dir=SNAPSHOT_DIR) as tmp_dir:
+        raw_path = os.path.join(tmp_dir, "catalog.sqlite")
+        # هر چهار جدول در یک تراکنش و از یک نقطه زمانی خوانده می‌شوند؛ با READ COMMITTED پیش‌فرض Postgres
+        # هر SELECT داده متفاوتی می‌بیند و ممکن است musics به artist/album ای اشاره کند که در snapshot نیست
+        with database.engine.connect().execution_options(
+            isolation_level="SERIALIZABLE", postgresql_readonly=True, postgresql_deferrable=True
+        ) as conn:
+            db = database.SessionLocal(bind=conn)
+            try:
+                _write_sqlite(db, raw_path)
+            finally:
+                db.close()
+
+        gz_path = raw_path + ".gz"
+        # mtime=0 تا خروجی برای داده یکسان، بایت‌به‌بایت یکسان باشد (و ETag تغییر نکند)
+        with open(raw_path, "rb") as src, open(gz_path, "wb") as raw_dst:
+            with gzip.GzipFile(filename="catalog.sqlite", mode="wb", fileobj=raw_dst, compresslevel=9, mtime=0) as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+
+        sha256 = _file_sha256(gz_path)
+        previous = get_manifest()
+        if previous and previous["sha256"] == sha256:
+            # زمان manifest به‌روز می‌شود تا worker های دیگر تا دور بعد دوباره نسازند
+            os.utime(os.path.join(SNAPSHOT_DIR, MANIFEST_NAME))
+            return previous
+
+        version = int(time.time())
+        file_name = f"catalog-{version}-{sha256[:12]}.sqlite.gz"
+        os.replace(gz_path, os.path.join(SNAPSHOT_DIR, file_name))
+
+    manifest = {
+        "version": version,
+        "schema_version": SNAPSHOT_SCHEMA_VERSION,
+        "file": file_name,
+        "sha256": sha256,
+        "size": os.path.getsize(os.path.join(SNAPSHOT_DIR, file_name)),
+        "format": "sqlite+gzip",
+    }
+    _write_manifest(manifest)
+    _cleanup(file_name)
+    return manifest
+
+
+def _run():
+    while not _stop_event.is_set():
+        try:
+            build_snapshot()
+        except Exception: # خطای ساخت نباید thread پس‌زمینه را متوقف کند
+            logger.exception("Catalog snapshot build failed")
+        _stop_event.wait(SNAPSHOT_INTERVAL)
+
+
+def start_builder():
+    # اجرای سازنده snapshot در یک thread پس‌زمینه
+    global _thread
+    if not SNAPSHOT_IN_PROCESS:
+        return
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop_event.clear()
+    _thread = threading.Thread(target=_run, name="catalog-snapshot-builder", daemon=True)
+    _thread.start()
+
+
+def stop_builder():
+    _stop_event.set()
+
+
+if __name__ == "__main__":
+    # اجرای سازنده به صورت پروسه جدا (همراه با CATALOG_SNAPSHOT_IN_PROCESS=0 برای API)
+    logging.basicConfig(level=logging.INFO)
+    while True:
+        try:
+            build_snapshot(force=True)
+        except Exception:
+            logger.exception("Catalog snapshot build failed")
+        time.sleep(SNAPSHOT_INTERVAL)
@@ -0,0 +1,45 @@
+# goranify-backend/tests/conftest.py
+
+# تنظیمات مشترک تست‌ها: یک دیتابیس SQLite موقت و مسیر ماژول‌های پروژه
+
+import os
+import sys
+import tempfile
+
+# DATABASE_URL باید قبل از import کردن database تنظیم شود
+_DB_DIR = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+# snapshot ها هم در پوشه موقت ساخته می‌شوند و سازنده پس‌زمینه در تست‌ها اجرا نمی‌شود
+os.environ.setdefault("CATALOG_SNAPSHOT_DIR", os.path.join(_DB_DIR, "snapshots"))
+os.environ.setdefault("CATALOG_SNAPSHOT_IN_PROCESS", "0")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import functools
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def fresh_db():
+    database.Base.metadata.drop_all(bind=database.engine)
+    database.Base.metadata.create_all(bind=database.engine)
+    yield
+
+
+@functools.lru_cache(maxsize=None)
+def _json_input_class(schema_cls):
+    # crud از model_dump() استفاده می‌کند؛ URL ها باید رشته dump شوند (SQLite نوع HttpUrl را bind نمی‌کند)
+    class JsonInput(schema_cls):
+        def model_dump(self, **kwargs):
+            return super().model_dump(mode="json", **kwargs)
+    return JsonInput
+
+
+@pytest.fixture
+def json_input():
+    # ورودی اعتبارسنجی‌شده یک schema (مثلاً schemas.MusicCreate) برای توابع crud
+    def make(schema_cls, **fields):
+        return _json_input_class(schema_cls)(**fields)
+    return make
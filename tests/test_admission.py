@@ -0,0 +1,311 @@
+# goranify-backend/tests/test_admission.py
+
+# تست کنترل پذیرش: Bulkhead (انتقال جایگاه، timeout، لغو)، پاسخ‌های 503/429 و مهلت مشترک با سقف سراسری
+
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import admission
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _settle():
+    # چند دور event loop تا task های منتظر به صف برسند
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+# --- Bulkhead ---
+def test_bulkhead_hands_slot_to_waiter():
+    async def scenario():
+        bulkhead = admission.Bulkhead(max_concurrent=1, max_queue=1, timeout=1.0)
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await _settle()
+        assert not waiter.done() and len(bulkhead._waiters) == 1
+
+        bulkhead.release() # جایگاه مستقیماً به منتظر می‌رسد، active کم نمی‌شود
+        await waiter
+        assert bulkhead.active == 1 and not bulkhead._waiters
+        bulkhead.release()
+        assert bulkhead.active == 0
+    _run(scenario())
+
+
+def test_bulkhead_rejects_on_timeout_and_full_queue():
+    async def scenario():
+        bulkhead = admission.Bulkhead(max_concurrent=1, max_queue=1, timeout=0.05)
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await _settle()
+
+        with pytest.raises(admission.AdmissionRejected) as full:
+            await bulkhead.acquire() # صف پر است: بدون انتظار رد می‌شود
+        assert full.value.retry_after == 0.05
+
+        with pytest.raises(admission.AdmissionRejected):
+            await waiter
+        assert bulkhead.active == 1 and not bulkhead._waiters
+
+        with pytest.raises(admission.AdmissionRejected):
+            await bulkhead.acquire(timeout=0) # مهلت درخواست قبلاً تمام شده است
+        bulkhead.release()
+        assert bulkhead.active == 0
+    _run(scenario())
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        bulkhead = admission.Bulkhead(max_concurrent=1, max_queue=2, timeout=1.0)
+        await bulkhead.acquire()
+        waiter = asyncio.create_task(bulkhead.acquire())
+        await _settle()
+        waiter.cancel() # قطع اتصال کلاینت در حین انتظار
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert bulkhead.active == 1 and not bulkhead._waiters
+
+        bulkhead.release()
+        assert bulkhead.active == 0
+        await bulkhead.acquire() # جایگاه آزاد شده دوباره قابل استفاده است
+        assert bulkhead.active == 1
+    _run(scenario())
+
+
+def test_abandon_after_handoff_returns_slot():
+    # نوبت درست هم‌زمان با timeout رسیده است: جایگاهی که منتقل شده باید پس داده شود
+    async def scenario():
+        bulkhead = admission.Bulkhead(max_concurrent=1, max_queue=1, timeout=1.0)
+        await bulkhead.acquire()
+        waiter = asyncio.get_running_loop().create_future()
+        bulkhead._waiters.append(waiter)
+        bulkhead.release()
+        assert waiter.done() and bulkhead.active == 1
+
+        bulkhead._abandon(waiter)
+        assert bulkhead.active == 0 and not bulkhead._waiters
+    _run(scenario())
+
+
+def test_release_skips_cancelled_waiters():
+    async def scenario():
+        bulkhead = admission.Bulkhead(max_concurrent=1, max_queue=2, timeout=1.0)
+        await bulkhead.acquire()
+        gone = asyncio.get_running_loop().create_future()
+        gone.cancel()
+        live = asyncio.create_task(bulkhead.acquire())
+        await _settle()
+        bulkhead._waiters.appendleft(gone)
+
+        bulkhead.release()
+        await live
+        assert bulkhead.active == 1 and not bulkhead._waiters
+    _run(scenario())
+
+
+# --- Middleware ---
+@pytest.fixture
+def limits(monkeypatch):
+    monkeypatch.setattr(admission, "ROUTE_CONCURRENCY", 1)
+    monkeypatch.setattr(admission, "ROUTE_QUEUE_SIZE", 1)
+    monkeypatch.setattr(admission, "QUEUE_TIMEOUT", 0.1)
+    monkeypatch.setattr(admission, "GLOBAL_CONCURRENCY", 10)
+    monkeypatch.setattr(admission, "GLOBAL_QUEUE_SIZE", 10)
+    monkeypatch.setattr(admission, "RATE_LIMIT_PER_SECOND", 1000.0)
+    monkeypatch.setattr(admission, "RATE_LIMIT_BURST", 1000.0)
+    return monkeypatch
+
+
+def _app(gate: asyncio.Event):
+    app = FastAPI()
+
+    @app.get("/slow")
+    async def slow():
+        await gate.wait()
+        return {"ok": True}
+
+    @app.get("/other")
+    async def other():
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    app.add_middleware(admission.AdmissionControlMiddleware)
+    return app
+
+
+def _client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test")
+
+
+def test_route_full_returns_503_with_retry_after(limits):
+    async def scenario():
+        gate = asyncio.Event()
+        async with _client(_app(gate)) as client:
+            holder = asyncio.create_task(client.get("/slow"))
+            await _settle()
+            queued = asyncio.create_task(client.get("/slow"))
+            await _settle()
+
+            full = await client.get("/slow") # صف یک‌نفره پر است
+            assert full.status_code == 503
+            assert full.headers["retry-after"] == "1"
+
+            other = await client.get("/other") # route های دیگر bulkhead جدا دارند
+            assert other.status_code == 200
+
+            timed_out = await queued # بعد از QUEUE_TIMEOUT رد می‌شود
+            assert timed_out.status_code == 503
+            assert timed_out.headers["retry-after"] == "1"
+
+            gate.set()
+            assert (await holder).status_code == 200
+            # جایگاه‌ها نشت نکرده‌اند
+            assert (await client.get("/slow")).status_code == 200
+    _run(scenario())
+
+
+def test_queued_request_runs_when_slot_frees(limits):
+    limits.setattr(admission, "QUEUE_TIMEOUT", 2.0)
+
+    async def scenario():
+        gate = asyncio.Event()
+        async with _client(_app(gate)) as client:
+            holder = asyncio.create_task(client.get("/slow"))
+            await _settle()
+            queued = asyncio.create_task(client.get("/slow"))
+            await _settle()
+            gate.set()
+            assert (await holder).status_code == 200
+            assert (await queued).status_code == 200
+    _run(scenario())
+
+
+def test_global_limit_shares_request_deadline(limits):
+    limits.setattr(admission, "QUEUE_TIMEOUT", 0.3)
+    limits.setattr(admission, "GLOBAL_CONCURRENCY", 1)
+    limits.setattr(admission, "GLOBAL_QUEUE_SIZE", 5)
+
+    async def scenario():
+        gate = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        async with _client(_app(gate)) as client:
+            holder = asyncio.create_task(client.get("/slow")) # سقف سراسری را پر می‌کند
+            await _settle()
+            first = asyncio.create_task(client.get("/other")) # جایگاه route را دارد و منتظر سقف سراسری است
+            await asyncio.sleep(0.15)
+
+            start = loop.time()
+            second = await client.get("/other") # 0.15 ثانیه در صف route، سپس باقی مهلت در صف سراسری
+            elapsed = loop.time() - start
+            assert second.status_code == 503
+            assert (await first).status_code == 503
+            # کل انتظار درخواست QUEUE_TIMEOUT است، نه مجموع مهلت route و سقف سراسری (0.45)
+            assert elapsed < 0.38
+
+            gate.set()
+            assert (await holder).status_code == 200
+            assert (await client.get("/other")).status_code == 200
+    _run(scenario())
+
+
+def test_rate_limit_returns_429(limits):
+    limits.setattr(admission, "RATE_LIMIT_PER_SECOND", 0.5)
+    limits.setattr(admission, "RATE_LIMIT_BURST", 2.0)
+
+    async def scenario():
+        async with _client(_app(asyncio.Event())) as client:
+            assert (await client.get("/other")).status_code == 200
+            assert (await client.get("/other")).status_code == 200
+            limited = await client.get("/other")
+            assert limited.status_code == 429
+            assert limited.headers["retry-after"] == "2"
+            # مسیرهای معاف محدود نمی‌شوند
+            assert (await client.get("/health")).status_code == 200
+            # کلید API نامعتبر شناسه جدا نمی‌گیرد
+            assert (await client.get("/other", headers={"X-API-Key": "random"})).status_code == 429
+    _run(scenario())
+
+
+def test_trusted_api_key_gets_own_bucket(limits):
+    limits.setattr(admission, "RATE_LIMIT_PER_SECOND", 0.5)
+    limits.setattr(admission, "RATE_LIMIT_BURST", 1.0)
+    limits.setattr(admission, "TRUSTED_API_KEYS", {"partner"})
+
+    async def scenario():
+        async with _client(_app(asyncio.Event())) as client:
+            assert (await client.get("/other")).status_code == 200
+            assert (await client.get("/other")).status_code == 429
+            assert (await client.get("/other", headers={"X-API-Key": "partner"})).status_code == 200
+    _run(scenario())
+
+
+@pytest.mark.parametrize("path, query, expected", [
+    ("/musics/search/", b"query=x", True),
+    ("/musics/", b"", False),
+    ("/musics/", b"limit=200", False), # برابر LARGE_LIMIT هنوز عادی است
+    ("/musics/", b"limit=201", True),
+    ("/artists/", b"skip=0&limit=500", True),
+    ("/musics/", b"limit=abc", False),
+    ("/musics/", b"limit=", False),
+    ("/musics/5", b"limit=500", False), # فقط مسیرهای لیست
+])
+def test_is_expensive(monkeypatch, path, query, expected):
+    monkeypatch.setattr(admission, "LARGE_LIMIT", 200)
+    assert admission._is_expensive(path, query) is expected
+
+
+def _list_app(gate: asyncio.Event):
+    app = FastAPI()
+
+    @app.get("/musics/")
+    async def musics(limit: int = 100, hold: bool = False):
+        if hold:
+            await gate.wait()
+        return {"limit": limit}
+
+    app.add_middleware(admission.AdmissionControlMiddleware)
+    return app
+
+
+def test_large_limit_uses_separate_expensive_budget(limits):
+    limits.setattr(admission, "ROUTE_CONCURRENCY", 1)
+    limits.setattr(admission, "ROUTE_QUEUE_SIZE", 0)
+    limits.setattr(admission, "EXPENSIVE_CONCURRENCY", 1)
+    limits.setattr(admission, "EXPENSIVE_QUEUE_SIZE", 0)
+    limits.setattr(admission, "LARGE_LIMIT", 200)
+
+    async def scenario():
+        gate = asyncio.Event()
+        async with _client(_list_app(gate)) as client:
+            heavy = asyncio.create_task(client.get("/musics/?limit=500&hold=true"))
+            await _settle()
+            # bulkhead سنگین پر است، ولی لیست‌های کوچک همان route را مسدود نمی‌کند
+            assert (await client.get("/musics/?limit=10")).status_code == 200
+            assert (await client.get("/musics/?limit=600")).status_code == 503
+
+            light = asyncio.create_task(client.get("/musics/?limit=10&hold=true"))
+            await _settle()
+            assert (await client.get("/musics/?limit=10")).status_code == 503
+
+            gate.set()
+            assert (await heavy).status_code == 200
+            assert (await light).status_code == 200
+            assert (await client.get("/musics/?limit=600")).status_code == 200
+    _run(scenario())
+
+
+def test_default_global_concurrency_uses_pool_settings(monkeypatch):
+    monkeypatch.setattr(admission.database, "POOL_SIZE", 7)
+    monkeypatch.setattr(admission.database, "MAX_OVERFLOW", 3)
+    assert admission._default_global_concurrency() == 10
+    monkeypatch.setattr(admission.database, "MAX_OVERFLOW", -1)
+    assert admission._default_global_concurrency() == admission.ROUTE_CONCURRENCY
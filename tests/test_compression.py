@@ -0,0 +1,195 @@
+# goranify-backend/tests/test_compression.py
+
+# تست CompressionMiddleware روی یک app کوچک: انتخاب encoding، آستانه حجم، 304، passthrough و کش LRU
+
+import random
+from collections import OrderedDict
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+from fastapi.testclient import TestClient
+
+import compression
+import etags
+
+BIG = {"items": ["goranify"] * 500} # حدود 5KB، بالاتر از آستانه
+SMALL = {"ok": True}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/big")
+    def big():
+        return BIG
+
+    @app.get("/small")
+    def small():
+        return SMALL
+
+    @app.get("/random")
+    def random_bytes():
+        # داده غیرقابل فشرده‌سازی: نسخه فشرده از اصل بزرگ‌تر است
+        return Response(random.Random(0).randbytes(2048), media_type="application/json")
+
+    @app.get("/text")
+    def text():
+        return PlainTextResponse("x" * 5000)
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\0" * 5000, media_type="application/octet-stream")
+
+    @app.get("/partial")
+    def partial():
+        return Response(b"{" + b" " * 5000 + b"}", status_code=206, media_type="application/json")
+
+    @app.get("/same-etag/{name}")
+    def same_etag(name: str):
+        # دو resource متفاوت با ETag یکسان (مثلاً شماره نسخه)
+        return Response(('{"name": "%s", "pad": "%s"}' % (name, "x" * 5000)).encode(),
+                        media_type="application/json", headers={"ETag": '"1"'})
+
+    @app.get("/not-modified")
+    def not_modified():
+        return Response(status_code=304, headers={"ETag": '"v1"'})
+
+    app.add_middleware(compression.CompressionMiddleware, minimum_size=1024)
+    compression.cache._items.clear()
+    compression.cache.size = 0
+    return TestClient(app)
+
+
+def _gzip_stats():
+    return dict(compression.get_metrics()["gzip"])
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("gzip", "gzip"),
+    ("gzip;q=0.5, br;q=0.9", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("*", "zstd"),
+    ("*;q=0.3, gzip;q=0.2", "zstd"),
+    ("zstd;q=0, *", "br"),
+    ("identity", None),
+    ("gzip;q=0", None),
+    ("", None),
+    ("GZIP; q=1", "gzip"),
+    ("gzip;q=abc", None),
+])
+def test_choose_encoding(monkeypatch, accept, expected):
+    encoders = OrderedDict((name, None) for name in ("zstd", "br", "gzip"))
+    monkeypatch.setattr(compression, "ENCODERS", encoders)
+    assert compression.choose_encoding(accept) == expected
+
+
+def test_choose_encoding_skips_unavailable(monkeypatch):
+    monkeypatch.setattr(compression, "ENCODERS", OrderedDict(gzip=None))
+    assert compression.choose_encoding("br, zstd") is None
+    assert compression.choose_encoding("br, gzip;q=0.1") == "gzip"
+
+
+def test_large_json_is_compressed_and_cached(client):
+    before = _gzip_stats()
+    first = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    after = _gzip_stats()
+
+    assert first.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in first.headers["vary"]
+    assert first.json() == BIG # httpx بدنه gzip را خودش باز می‌کند
+    assert int(first.headers["content-length"]) < len(first.content)
+    assert first.headers["etag"] == second.headers["etag"]
+    assert after["compressions"] - before["compressions"] == 1
+    assert after["cache_hits"] - before["cache_hits"] == 1
+
+
+def test_identity_and_small_responses_are_not_compressed(client):
+    plain = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == BIG
+    assert "etag" in plain.headers
+
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.json() == SMALL
+
+
+def test_incompressible_body_is_sent_plain_and_not_recorded(client):
+    before = _gzip_stats()
+    response = client.get("/random", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert len(response.content) == 2048
+    assert _gzip_stats() == before
+
+
+@pytest.mark.parametrize("path, status", [("/binary", 200), ("/partial", 206), ("/not-modified", 304)])
+def test_passthrough(client, path, status):
+    response = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status
+    assert "content-encoding" not in response.headers
+    if status != 304:
+        assert "etag" not in response.headers
+
+
+def test_text_is_compressed(client):
+    response = client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "x" * 5000
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get("/big", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    before = _gzip_stats()
+
+    response = client.get("/big", headers={"Accept-Encoding": "gzip", "If-None-Match": f'"other", {etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert "content-encoding" not in response.headers
+    assert _gzip_stats() == before
+
+    # ETag ضعیف با مقایسه ضعیف، بدون پیشوند W/ هم پذیرفته می‌شود
+    assert client.get("/big", headers={"If-None-Match": etag[2:]}).status_code == 304
+    assert client.get("/big", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_cache_is_keyed_per_resource(client):
+    for _ in range(2): # دور دوم از کش خوانده می‌شود
+        for path in ("/same-etag/a", "/same-etag/b", "/same-etag/a?v=2"):
+            response = client.get(path, headers={"Accept-Encoding": "gzip"})
+            assert response.headers["content-encoding"] == "gzip"
+            assert response.json()["name"] == path.split("/")[-1].split("?")[0]
+    assert len(compression.cache) == 3
+
+
+@pytest.mark.parametrize("if_none_match, etag, expected", [
+    ('"a"', '"a"', True),
+    ('W/"a"', '"a"', True),
+    ('"a"', 'W/"a"', True),
+    ('"b", W/"a"', 'W/"a"', True),
+    ("*", '"a"', True),
+    ('"b"', '"a"', False),
+    ("", '"a"', False),
+])
+def test_etag_matches(if_none_match, etag, expected):
+    assert etags.etag_matches(if_none_match, etag) is expected
+
+
+def test_cache_evicts_least_recently_used_by_bytes():
+    cache = compression.CompressedCache(max_bytes=10)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa" # a تازه‌ترین می‌شود
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    assert cache.size == 8
+
+    cache.put("a", b"aa") # جایگزینی، حجم قبلی را کم می‌کند
+    assert cache.size == 6
+    cache.put("huge", b"x" * 11) # بزرگ‌تر از کل کش ذخیره نمی‌شود
+    assert cache.get("huge") is None
+    assert len(cache) == 2 and cache.size == 6
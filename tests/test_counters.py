@@ -0,0 +1,127 @@
+# goranify-backend/tests/test_counters.py
+
+# تست شمارنده‌های denormalized در مسیرهای ساخت، جابه‌جایی، حذف و بازسازی (reconcile)
+
+import pytest
+
+import crud
+import database
+import models
+import schemas
+
+pytestmark = pytest.mark.usefixtures("fresh_db")
+
+
+@pytest.fixture
+def db():
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def music_in(json_input):
+    def make(title, artist_id, album_id=None, genre_id=None):
+        return json_input(
+            schemas.MusicCreate, title=title, artist_id=artist_id, album_id=album_id, genre_id=genre_id,
+            audio_128_url="http://cdn.test/128.mp3", audio_320_url="http://cdn.test/320.mp3",
+        )
+    return make
+
+
+def _counts(db):
+    # مقدار ذخیره‌شده شمارنده‌ها، مستقیم از دیتابیس (نه از identity map)
+    db.expire_all()
+    return {
+        "artists": {a.id: (a.album_count, a.track_count) for a in db.query(models.Artist)},
+        "albums": {a.id: a.track_count for a in db.query(models.Album)},
+        "genres": {g.id: g.track_count for g in db.query(models.Genre)},
+    }
+
+
+@pytest.fixture
+def catalog(db):
+    artist_a = crud.create_artist(db, schemas.ArtistCreate(full_name="A"))
+    artist_b = crud.create_artist(db, schemas.ArtistCreate(full_name="B"))
+    album_a = crud.create_album(db, schemas.AlbumCreate(title="AA", artist_id=artist_a.id))
+    album_b = crud.create_album(db, schemas.AlbumCreate(title="BB", artist_id=artist_b.id))
+    genre_x = crud.create_genre(db, schemas.GenreCreate(name="X"))
+    genre_y = crud.create_genre(db, schemas.GenreCreate(name="Y"))
+    return {
+        "artist_a": artist_a.id, "artist_b": artist_b.id,
+        "album_a": album_a.id, "album_b": album_b.id,
+        "genre_x": genre_x.id, "genre_y": genre_y.id,
+    }
+
+
+def test_create_increments_counters(db, catalog, music_in):
+    c = catalog
+    crud.create_music(db, music_in("1", c["artist_a"], c["album_a"], c["genre_x"]))
+    crud.create_music(db, music_in("2", c["artist_a"], c["album_a"], c["genre_x"]))
+    crud.create_music(db, music_in("3", c["artist_a"]))
+
+    counts = _counts(db)
+    assert counts["artists"] == {c["artist_a"]: (1, 3), c["artist_b"]: (1, 0)}
+    assert counts["albums"] == {c["album_a"]: 2, c["album_b"]: 0}
+    assert counts["genres"] == {c["genre_x"]: 2, c["genre_y"]: 0}
+
+
+def test_move_music_between_parents(db, catalog, music_in):
+    c = catalog
+    music = crud.create_music(db, music_in("1", c["artist_a"], c["album_a"], c["genre_x"]))
+
+    crud.update_music(db, music.id, music_in("1", c["artist_b"], c["album_b"], c["genre_y"]))
+    counts = _counts(db)
+    assert counts["artists"] == {c["artist_a"]: (1, 0), c["artist_b"]: (1, 1)}
+    assert counts["albums"] == {c["album_a"]: 0, c["album_b"]: 1}
+    assert counts["genres"] == {c["genre_x"]: 0, c["genre_y"]: 1}
+
+    # خارج کردن از آلبوم و ژانر (None) فقط طرف قدیمی را کم می‌کند
+    crud.update_music(db, music.id, music_in("1", c["artist_b"]))
+    counts = _counts(db)
+    assert counts["albums"] == {c["album_a"]: 0, c["album_b"]: 0}
+    assert counts["genres"] == {c["genre_x"]: 0, c["genre_y"]: 0}
+    assert counts["artists"][c["artist_b"]] == (1, 1)
+
+    # به‌روزرسانی بدون جابه‌جایی شمارنده‌ها را تغییر نمی‌دهد
+    crud.update_music(db, music.id, music_in("renamed", c["artist_b"]))
+    assert _counts(db) == counts
+
+
+def test_move_album_between_artists(db, catalog):
+    c = catalog
+    crud.update_album(db, c["album_a"], schemas.AlbumCreate(title="AA", artist_id=c["artist_b"]))
+    assert _counts(db)["artists"] == {c["artist_a"]: (0, 0), c["artist_b"]: (2, 0)}
+
+
+def test_delete_decrements_counters(db, catalog, music_in):
+    c = catalog
+    music = crud.create_music(db, music_in("1", c["artist_a"], c["album_a"], c["genre_x"]))
+    crud.create_music(db, music_in("2", c["artist_a"], c["album_a"], c["genre_x"]))
+
+    assert crud.delete_music(db, music.id) is not None
+    counts = _counts(db)
+    assert counts["artists"][c["artist_a"]] == (1, 1)
+    assert counts["albums"][c["album_a"]] == 1
+    assert counts["genres"][c["genre_x"]] == 1
+
+    assert crud.delete_album(db, c["album_b"]) is not None
+    assert _counts(db)["artists"][c["artist_b"]] == (0, 0)
+    assert crud.delete_music(db, music.id) is None
+
+
+def test_reconcile_repairs_drift(db, catalog, music_in):
+    c = catalog
+    crud.create_music(db, music_in("1", c["artist_a"], c["album_a"], c["genre_x"]))
+    crud.create_music(db, music_in("2", c["artist_b"], c["album_a"], c["genre_y"]))
+    expected = _counts(db)
+
+    # ویرایش دستی که از crud عبور نمی‌کند و شمارنده‌ها را خراب می‌کند
+    db.query(models.Artist).update({models.Artist.track_count: 42, models.Artist.album_count: 7})
+    db.query(models.Album).update({models.Album.track_count: -1})
+    db.query(models.Genre).update({models.Genre.track_count: 0})
+    db.commit()
+    assert _counts(db) != expected
+
+    crud.reconcile_counters(db)
+    assert _counts(db) == expected
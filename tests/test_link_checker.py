@@ -0,0 +1,352 @@
+# goranify-backend/tests/test_link_checker.py
+
+# تست link_checker در برابر یک سرور HTTP جایگزین (httpx.MockTransport)، یک سرور http.server واقعی
+# روی 127.0.0.1 و یک دیتابیس SQLite موقت
+
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+import crud
+import database
+import link_checker
+import models
+import schemas
+
+pytestmark = pytest.mark.usefixtures("fresh_db")
+
+
+def _add_music(db, artist, title, audio_128, audio_320, cover=None):
+    music = models.Music(title=title, artist_id=artist.id, audio_128_url=audio_128, audio_320_url=audio_320, cover_url=cover)
+    db.add(music)
+    db.commit()
+    return music.id
+
+
+def _status(model, obj_id):
+    db = database.SessionLocal()
+    try:
+        return db.get(model, obj_id).link_status
+    finally:
+        db.close()
+
+
+def _stand_in_server(routes, calls):
+    # routes: path -> {"HEAD": status, "GET": status} یا یک Exception برای شبیه‌سازی خطای شبکه
+    async def handler(request):
+        calls.append((request.method, request.url.path, request.headers.get("range")))
+        route = routes[request.url.path]
+        if isinstance(route, Exception):
+            raise route
+        return httpx.Response(route.get(request.method, route.get("HEAD")))
+    return httpx.MockTransport(handler)
+
+
+def test_check_all_links_stores_status():
+    routes = {
+        "/ok": {"HEAD": 200},
+        "/missing": {"HEAD": 404},
+        "/gone": {"HEAD": 410},
+        "/no-head": {"HEAD": 405, "GET": 206},
+        "/no-head-dead": {"HEAD": 501, "GET": 404},
+        "/flaky": {"HEAD": 503},
+        "/down": httpx.ConnectError("connection refused"),
+        "/ad": {"HEAD": 200},
+        "/ad-missing": {"HEAD": 404},
+    }
+    calls = []
+    db = database.SessionLocal()
+    artist = models.Artist(full_name="A")
+    db.add(artist)
+    db.commit()
+    album = models.Album(title="X", artist_id=artist.id, cover_url="http://cdn.test/gone")
+    db.add(album)
+    db.commit()
+    ids = {
+        "ok": _add_music(db, artist, "ok", "http://cdn.test/ok", "http://cdn.test/ok", "http://cdn.test/ok"),
+        "broken": _add_music(db, artist, "broken", "http://cdn.test/ok", "http://cdn.test/missing"),
+        "fallback_ok": _add_music(db, artist, "fallback", "http://cdn.test/no-head", "http://cdn.test/ok"),
+        "fallback_dead": _add_music(db, artist, "fallback dead", "http://cdn.test/no-head-dead", "http://cdn.test/ok"),
+        "server_error": _add_music(db, artist, "5xx", "http://cdn.test/flaky", "http://cdn.test/ok"),
+        "network_error": _add_music(db, artist, "down", "http://cdn.test/down", "http://cdn.test/ok"),
+        "cover_broken": _add_music(db, artist, "cover", "http://cdn.test/ok", "http://cdn.test/ok", "http://cdn.test/gone"),
+    }
+    album_id = album.id
+    ads = {
+        "ok": models.Advertisement(title="ok", link="http://ads.test/ad", cover_url="http://ads.test/ad"),
+        "broken": models.Advertisement(title="dead link", link="http://ads.test/ad-missing", cover_url="http://ads.test/ad"),
+        "cover_broken": models.Advertisement(title="dead cover", link="http://ads.test/ad", cover_url="http://ads.test/ad-missing"),
+    }
+    db.add_all(ads.values())
+    db.commit()
+    ad_ids = {name: ad.id for name, ad in ads.items()}
+    db.close()
+
+    async def run():
+        async with httpx.AsyncClient(transport=_stand_in_server(routes, calls)) as client:
+            await link_checker.check_all_links(client=client)
+    asyncio.run(run())
+
+    assert _status(models.Music, ids["ok"]) == link_checker.STATUS_OK
+    assert _status(models.Music, ids["broken"]) == link_checker.STATUS_BROKEN
+    assert _status(models.Music, ids["fallback_ok"]) == link_checker.STATUS_OK
+    assert _status(models.Music, ids["fallback_dead"]) == link_checker.STATUS_BROKEN
+    assert _status(models.Music, ids["server_error"]) == link_checker.STATUS_ERROR
+    assert _status(models.Music, ids["network_error"]) == link_checker.STATUS_ERROR
+    assert _status(models.Music, ids["cover_broken"]) == link_checker.STATUS_COVER_BROKEN
+    assert _status(models.Album, album_id) == link_checker.STATUS_COVER_BROKEN
+    assert _status(models.Advertisement, ad_ids["ok"]) == link_checker.STATUS_OK
+    assert _status(models.Advertisement, ad_ids["broken"]) == link_checker.STATUS_BROKEN
+    assert _status(models.Advertisement, ad_ids["cover_broken"]) == link_checker.STATUS_COVER_BROKEN
+
+    db = database.SessionLocal()
+    try:
+        visible = {ad.id for ad in crud.get_advertisements(db, exclude_broken=True)}
+    finally:
+        db.close()
+    assert visible == {ad_ids["ok"], ad_ids["cover_broken"]}
+
+    # fallback فقط با Range: bytes=0-0 و فقط برای URL هایی که HEAD را رد کردند
+    assert ("GET", "/no-head", "bytes=0-0") in calls
+    assert ("GET", "/no-head-dead", "bytes=0-0") in calls
+    assert all(path in ("/no-head", "/no-head-dead") for method, path, _ in calls if method == "GET")
+    # هر URL فقط یک بار با HEAD بررسی می‌شود، حتی اگر در چند رکورد تکرار شده باشد
+    assert sum(1 for method, path, _ in calls if method == "HEAD" and path == "/ok") == 1
+
+
+def test_url_edited_during_check_keeps_unknown_status():
+    db = database.SessionLocal()
+    artist = models.Artist(full_name="A")
+    db.add(artist)
+    db.commit()
+    music_id = _add_music(db, artist, "t", "http://cdn.test/old", "http://cdn.test/old")
+    db.close()
+
+    async def handler(request):
+        # ادمین در حین بررسی، لینک را اصلاح می‌کند (مثل crud.update_music)
+        edit = database.SessionLocal()
+        music = edit.get(models.Music, music_id)
+        music.audio_128_url = music.audio_320_url = "http://cdn.test/new"
+        music.link_status = "unknown"
+        edit.commit()
+        edit.close()
+        return httpx.Response(404)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await link_checker.check_all_links(client=client)
+    asyncio.run(run())
+
+    assert _status(models.Music, music_id) == link_checker.STATUS_UNKNOWN
+
+
+def test_advertisement_edit_resets_status(json_input):
+    db = database.SessionLocal()
+    try:
+        ad = models.Advertisement(title="ad", link="http://cdn.test/a", link_status=link_checker.STATUS_BROKEN)
+        db.add(ad)
+        db.commit()
+        # تغییر عنوان وضعیت را حفظ می‌کند، تغییر link آن را unknown می‌کند
+        crud.update_advertisement(db, ad.id, json_input(schemas.AdvertisementCreate, title="renamed", link="http://cdn.test/a"))
+        assert ad.link_status == link_checker.STATUS_BROKEN
+        crud.update_advertisement(db, ad.id, json_input(schemas.AdvertisementCreate, title="renamed", link="http://cdn.test/b"))
+        assert ad.link_status == link_checker.STATUS_UNKNOWN
+    finally:
+        db.close()
+
+
+def test_malformed_stored_url_does_not_stop_the_run():
+    db = database.SessionLocal()
+    artist = models.Artist(full_name="A")
+    db.add(artist)
+    db.commit()
+    ids = {
+        "bad_ipv6": _add_music(db, artist, "ipv6", "http://[::1", "http://cdn.test/ok"),
+        "bad_port": _add_music(db, artist, "port", "http://cdn.test:abc/x", "http://cdn.test/ok"),
+        "bad_cover": _add_music(db, artist, "cover", "http://cdn.test/ok", "http://cdn.test/ok", "http://[::1/c.jpg"),
+        "after": _add_music(db, artist, "after", "http://cdn.test/ok", "http://cdn.test/ok"),
+    }
+    db.close()
+
+    async def handler(request):
+        return httpx.Response(200)
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            await link_checker.check_all_links(client=client)
+    asyncio.run(run())
+
+    assert _status(models.Music, ids["bad_ipv6"]) == link_checker.STATUS_BROKEN
+    assert _status(models.Music, ids["bad_port"]) == link_checker.STATUS_BROKEN
+    assert _status(models.Music, ids["bad_cover"]) == link_checker.STATUS_COVER_BROKEN
+    # رکوردهای بعد از URL خراب هم بررسی و ذخیره می‌شوند
+    assert _status(models.Music, ids["after"]) == link_checker.STATUS_OK
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    # سرور جایگزین CDN: /no-head فقط GET با Range را قبول می‌کند و /slow از timeout کندتر است
+    protocol_version = "HTTP/1.1" # keep-alive
+    requests = []
+    connections = set()
+
+    def _record(self):
+        type(self).requests.append((self.command, self.path, self.headers.get("Range")))
+        type(self).connections.add(self.client_address)
+
+    def _reply(self, status, body=b"", headers=()):
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self._record()
+        if self.path.startswith("/slow"):
+            time.sleep(1)
+        if self.path.startswith("/no-head"):
+            self._reply(405)
+        elif self.path.startswith("/missing"):
+            self._reply(404)
+        else:
+            self._reply(200)
+
+    def do_GET(self):
+        self._record()
+        if self.headers.get("Range") == "bytes=0-0" and not self.path.startswith("/missing"):
+            self._reply(206, b"I", [("Content-Range", "bytes 0-0/1000")])
+        else:
+            self._reply(404)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in_server():
+    _StandInHandler.requests = []
+    _StandInHandler.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandInHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_check_all_links_against_local_server(stand_in_server, monkeypatch):
+    monkeypatch.setattr(link_checker, "TIMEOUT", 0.3) # new_client() مقدار را هنگام ساخت می‌خواند
+    base = stand_in_server
+    db = database.SessionLocal()
+    artist = models.Artist(full_name="A")
+    db.add(artist)
+    db.commit()
+    ids = {f"ok{i}": _add_music(db, artist, f"ok{i}", f"{base}/a{i}.mp3", f"{base}/b{i}.mp3") for i in range(4)}
+    ids["fallback"] = _add_music(db, artist, "fallback", f"{base}/no-head/a.mp3", f"{base}/ok.mp3")
+    ids["broken"] = _add_music(db, artist, "broken", f"{base}/missing.mp3", f"{base}/ok.mp3")
+    ids["timeout"] = _add_music(db, artist, "timeout", f"{base}/slow.mp3", f"{base}/ok.mp3")
+    db.close()
+
+    asyncio.run(link_checker.check_all_links()) # client واقعی از new_client()
+
+    for i in range(4):
+        assert _status(models.Music, ids[f"ok{i}"]) == link_checker.STATUS_OK
+    assert _status(models.Music, ids["fallback"]) == link_checker.STATUS_OK
+    assert _status(models.Music, ids["broken"]) == link_checker.STATUS_BROKEN
+    assert _status(models.Music, ids["timeout"]) == link_checker.STATUS_ERROR
+
+    requests = _StandInHandler.requests
+    assert ("GET", "/no-head/a.mp3", "bytes=0-0") in requests
+    assert [r for r in requests if r[0] == "GET"] == [("GET", "/no-head/a.mp3", "bytes=0-0")]
+    # اتصال‌های keep-alive دوباره استفاده می‌شوند: حداکثر یک اتصال برای هر جایگاه هم‌زمان host،
+    # به‌علاوه اتصالی که با timeout بسته شد
+    assert len(requests) == 13 # 12 URL یکتا + یک GET برای fallback
+    assert len(_StandInHandler.connections) <= link_checker.PER_HOST_CONCURRENCY + 1
+
+
+def test_host_rate_holds_when_global_limit_is_full():
+    starts = []
+
+    async def handler(request):
+        if request.url.host == "a.test":
+            starts.append(time.monotonic())
+        else:
+            await asyncio.sleep(0.3) # host های دیگر کل ظرفیت سراسری را نگه می‌دارند
+        return httpx.Response(200)
+
+    urls = [f"http://b{i}.test/x" for i in range(4)] + [f"http://a.test/{i}" for i in range(4)]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            checker = link_checker.LinkChecker(client, concurrency=4, per_host_concurrency=4, per_host_rate=20)
+            await checker.check_urls(urls)
+    asyncio.run(run())
+
+    # نوبت‌های نرخ در حین انتظار برای ظرفیت سراسری نمی‌سوزند، پس درخواست‌های a.test هم‌زمان ارسال نمی‌شوند
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert len(starts) == 4
+    assert min(gaps) >= 0.04
+
+
+def test_cancelled_host_wait_releases_slot():
+    async def scenario():
+        limiter = link_checker.HostLimiter(concurrency=1, rate=1)
+        async with limiter:
+            pass
+        waiting = asyncio.create_task(limiter.__aenter__()) # تا نوبت بعدی (1 ثانیه) می‌خوابد
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert not limiter.semaphore.locked()
+    asyncio.run(scenario())
+
+
+def test_per_host_concurrency_and_rate_limit():
+    active, peak = {}, {}
+
+    async def handler(request):
+        host = request.url.host
+        active[host] = active.get(host, 0) + 1
+        peak[host] = max(peak.get(host, 0), active[host])
+        await asyncio.sleep(0.02)
+        active[host] -= 1
+        return httpx.Response(200)
+
+    urls = [f"http://{host}/{i}" for host in ("a.test", "b.test") for i in range(10)]
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            checker = link_checker.LinkChecker(client, concurrency=10, per_host_concurrency=2, per_host_rate=50)
+            start = time.monotonic()
+            results = await checker.check_urls(urls)
+            return results, time.monotonic() - start
+
+    results, elapsed = asyncio.run(run())
+    assert set(results.values()) == {link_checker.URL_OK}
+    assert peak == {"a.test": 2, "b.test": 2}
+    # 10 درخواست با نرخ 50 در ثانیه برای هر host حداقل 9 فاصله 20 میلی‌ثانیه‌ای لازم دارد
+    assert elapsed >= 0.18
+
+
+@pytest.mark.parametrize("audio, cover, expected", [
+    ([link_checker.URL_OK, link_checker.URL_OK], link_checker.URL_OK, link_checker.STATUS_OK),
+    ([link_checker.URL_OK, link_checker.URL_DEAD], link_checker.URL_OK, link_checker.STATUS_BROKEN),
+    ([link_checker.URL_DEAD, link_checker.URL_ERROR], link_checker.URL_OK, link_checker.STATUS_BROKEN),
+    ([link_checker.URL_ERROR, link_checker.URL_OK], link_checker.URL_DEAD, link_checker.STATUS_ERROR),
+    ([link_checker.URL_OK, link_checker.URL_OK], link_checker.URL_DEAD, link_checker.STATUS_COVER_BROKEN),
+    ([link_checker.URL_OK, link_checker.URL_OK], link_checker.URL_ERROR, link_checker.STATUS_ERROR),
+    ([link_checker.URL_OK, link_checker.URL_OK], None, link_checker.STATUS_OK),
+])
+def test_record_status(audio, cover, expected):
+    results = {"a1": audio[0], "a2": audio[1]}
+    if cover is not None:
+        results["c"] = cover
+    assert link_checker._record_status(["a1", "a2"], "c" if cover is not None else None, results) == expected
@@ -0,0 +1,95 @@
+# goranify-backend/tests/test_snapshot.py
+
+# تست ساخت snapshot کاتالوگ و endpoint دانلود آن (GET / HEAD / Range / If-None-Match)
+
+import gzip
+import os
+import sqlite3
+import stat
+
+import pytest
+from fastapi.testclient import TestClient
+
+import database
+import main
+import models
+import snapshot
+
+pytestmark = pytest.mark.usefixtures("fresh_db")
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    db = database.SessionLocal()
+    artist = models.Artist(full_name="A", track_count=1, album_count=1)
+    db.add(artist)
+    db.commit()
+    album = models.Album(title="X", artist_id=artist.id, track_count=1)
+    db.add(album)
+    db.commit()
+    db.add(models.Music(title="t", artist_id=artist.id, album_id=album.id, lyrics="secret",
+                        audio_128_url="http://cdn.test/128", audio_320_url="http://cdn.test/320"))
+    db.commit()
+    db.close()
+    return snapshot.build_snapshot(force=True)
+
+
+def test_build_writes_readable_catalog(built, tmp_path):
+    path = tmp_path / built["file"]
+    assert built["size"] == path.stat().st_size
+    # manifest باید برای API ای که با کاربر دیگری اجرا می‌شود قابل خواندن باشد
+    assert stat.S_IMODE(os.stat(tmp_path / snapshot.MANIFEST_NAME).st_mode) == 0o644
+
+    raw = tmp_path / "catalog.sqlite"
+    raw.write_bytes(gzip.decompress(path.read_bytes()))
+    conn = sqlite3.connect(raw)
+    try:
+        assert conn.execute("SELECT title, artist_id, album_id FROM musics").fetchall() == [("t", 1, 1)]
+        assert conn.execute("SELECT track_count FROM albums").fetchall() == [(1,)]
+        assert "lyrics" not in [row[1] for row in conn.execute("PRAGMA table_info(musics)")]
+    finally:
+        conn.close()
+
+    # داده تغییر نکرده است، پس همان نسخه باقی می‌ماند
+    assert snapshot.build_snapshot(force=True) == built
+
+
+def test_build_skipped_while_locked(built, tmp_path):
+    with open(tmp_path / snapshot.LOCK_NAME, "w") as lock_file:
+        assert snapshot._try_lock(lock_file)
+        try:
+            assert snapshot.build_snapshot(force=True) is None
+        finally:
+            snapshot._unlock(lock_file)
+
+
+def test_download_endpoint(built):
+    etag = f'"{built["sha256"]}"'
+    with TestClient(main.app) as client:
+        head = client.head("/catalog/snapshot")
+        assert head.status_code == 200
+        assert head.headers["etag"] == etag
+        assert head.headers["accept-ranges"] == "bytes"
+        assert int(head.headers["content-length"]) == built["size"]
+        assert head.content == b""
+
+        full = client.get("/catalog/snapshot")
+        assert full.status_code == 200
+        assert full.headers["content-type"] == "application/gzip"
+        assert len(full.content) == built["size"]
+
+        part = client.get("/catalog/snapshot", headers={"Range": "bytes=0-9"})
+        assert part.status_code == 206
+        assert part.content == full.content[:10]
+
+        assert client.get("/catalog/snapshot", headers={"If-None-Match": f'W/"x", {etag}'}).status_code == 304
+        assert client.get("/catalog/snapshot/manifest").json() == built
+
+
+def test_download_before_first_build(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    with TestClient(main.app) as client:
+        response = client.get("/catalog/snapshot")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "60"
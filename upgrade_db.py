@@ -0,0 +1,73 @@
+# goranify-backend/upgrade_db.py
+
+# ارتقای دیتابیس موجود: create_all ستون‌های جدید را به جدول‌های قبلی اضافه نمی‌کند،
+# پس این اسکریپت ستون‌های جاافتاده را با ALTER TABLE اضافه می‌کند و سپس شمارنده‌ها را بازسازی می‌کند.
+# اجرا (قبل از راه‌اندازی نسخه جدید API): python upgrade_db.py
+
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+
+from sqlalchemy import inspect, text
+
+import crud
+import database
+import models
+
+# ستون‌هایی که بعد از ساخت اولیه جدول‌ها به مدل‌ها اضافه شده‌اند
+NEW_COLUMNS = [
+    models.Artist.__table__.c.album_count,
+    models.Artist.__table__.c.track_count,
+    models.Album.__table__.c.track_count,
+    models.Genre.__table__.c.track_count,
+    models.Album.__table__.c.link_status,
+    models.Album.__table__.c.link_checked_at,
+    models.Music.__table__.c.link_status,
+    models.Music.__table__.c.link_checked_at,
+    models.Advertisement.__table__.c.link_status,
+    models.Advertisement.__table__.c.link_checked_at,
+]
+
+
+def _column_ddl(column, dialect) -> str:
+    ddl = f"ALTER TABLE {column.table.name} ADD COLUMN {column.name} {column.type.compile(dialect=dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT '{column.server_default.arg}'"
+    if not column.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+
+def add_missing_columns(engine=None):
+    # فقط ستون‌هایی که وجود ندارند اضافه می‌شوند، پس اجرای دوباره بی‌خطر است
+    engine = engine or database.engine
+    inspector = inspect(engine)
+    added = []
+    with engine.begin() as conn:
+        for column in NEW_COLUMNS:
+            table = column.table.name
+            if not inspector.has_table(table):
+                continue # جدول توسط create_all با همه ستون‌ها ساخته خواهد شد
+            if column.name in {c["name"] for c in inspector.get_columns(table)}:
+                continue
+            conn.execute(text(_column_ddl(column, engine.dialect)))
+            if column.index:
+                conn.execute(text(f"CREATE INDEX ix_{table}_{column.name} ON {table} ({column.name})"))
+            added.append(f"{table}.{column.name}")
+    return added
+
+
+def main():
+    for name in add_missing_columns():
+        print(f"Added column {name}")
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        print(crud.reconcile_counters(db)["message"])
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()